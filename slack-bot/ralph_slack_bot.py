@@ -26,14 +26,34 @@ Setup:
 """
 
 import os
+import re
 import sys
 import json
 import argparse
 import logging
-from datetime import datetime
 from pathlib import Path
+from typing import Optional
 import fcntl
 import atexit
+import signal
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to stdlib json when orjson isn't installed
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    # Without watchdog, the tracker file is re-checked on every message
+    Observer = None
+    FileSystemEventHandler = object
 
 # Possible .env file locations (in order of preference)
 ENV_LOCATIONS = [
@@ -41,6 +61,12 @@ ENV_LOCATIONS = [
     Path(__file__).parent / ".env",             # Local to script
 ]
 
+# KEY=value lines in a .env file, with optional single or double quotes around the value
+ENV_LINE_PATTERN = re.compile(
+    r"""^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(?:"([^"\n]*)"|'([^'\n]*)'|(.*?))[ \t\r]*$""",
+    re.MULTILINE,
+)
+
 def load_env():
     """Load environment from .env files."""
     for env_file in ENV_LOCATIONS:
@@ -51,12 +77,8 @@ def load_env():
                 return str(env_file)
             except ImportError:
                 # Manual parsing fallback
-                with open(env_file) as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#') and '=' in line:
-                            key, value = line.split('=', 1)
-                            os.environ[key.strip()] = value.strip().strip('"').strip("'")
+                for m in ENV_LINE_PATTERN.finditer(env_file.read_text()):
+                    os.environ[m.group(1)] = m.group(2) or m.group(3) or m.group(4) or ""
                 return str(env_file)
     return None
 
@@ -83,6 +105,36 @@ GLOBAL_THREAD_FILE = GLOBAL_RALPH_DIR / "slack_threads.json"
 GLOBAL_PID_FILE = GLOBAL_RALPH_DIR / "slack_bot.pid"
 GLOBAL_LOG_FILE = GLOBAL_RALPH_DIR / "slack_bot.log"
 
+# Process umask, read once at startup (os.umask can only be read by setting it)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Seconds to buffer replies in the pending log before merging them into feedback.md
+FEEDBACK_COMPACT_DELAY = 2.0
+
+# Seconds to cache Slack display names before looking them up again
+USER_CACHE_TTL = 3600
+
+# Maximum number of display names to keep; least recently used are evicted first
+USER_CACHE_SIZE = 256
+
+
+class TrackerFileHandler(FileSystemEventHandler):
+    """Marks the bot's threads as dirty when the tracker file changes."""
+
+    def __init__(self, bot: "RalphSlackBot"):
+        super().__init__()
+        self.bot = bot
+        self.tracker_path = os.fsdecode(bot.tracker_file)
+
+    def on_any_event(self, event):
+        # Ignore opened/closed events, which every read of the tracker triggers
+        if event.event_type not in ("modified", "created", "moved", "deleted"):
+            return
+        paths = (event.src_path, getattr(event, "dest_path", ""))
+        if self.tracker_path in (os.fsdecode(p) for p in paths if p):
+            self.bot._threads_dirty = True
+
 
 class RalphSlackBot:
     def __init__(self, global_mode: bool = False):
@@ -100,8 +152,28 @@ class RalphSlackBot:
 
         self.ralph_dir.mkdir(parents=True, exist_ok=True)
 
-        self.threads = self._load_threads()
-        self._thread_to_plan = self._build_reverse_lookup()
+        self.threads = {}
+        self._thread_to_plan = {}
+        self._plan_to_feedback = {}
+        self._tracker_stat = None
+        self.reload_threads()
+
+        # Watch the tracker file so messages only trigger a reload after it changes.
+        # Start dirty so changes made before the observer starts aren't missed.
+        self._threads_dirty = True
+        self._observer = None
+        if Observer:
+            self._observer = Observer()
+            self._observer.schedule(TrackerFileHandler(self), str(self.tracker_file.parent), recursive=False)
+
+        # Replies waiting to be compacted into their feedback files
+        self._feedback_lock = threading.RLock()
+        self._pending_feedback = set()
+        self._compact_timer = None
+
+        # user_id -> (expires_at, display_name)
+        self._user_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._user_cache_lock = threading.Lock()
 
         # Initialize Slack app
         self.app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
@@ -110,68 +182,236 @@ class RalphSlackBot:
         # PID file handling
         self._pid_file_handle = None
 
-    def _load_threads(self) -> dict:
-        """Load thread tracking data (keyed by plan_file with absolute paths)."""
-        if self.tracker_file.exists():
-            try:
-                return json.loads(self.tracker_file.read_text())
-            except json.JSONDecodeError:
-                logger.warning("Could not parse thread tracker file, starting fresh")
-        return {}
+    def _load_threads(self) -> Optional[dict]:
+        """Load thread tracking data (keyed by plan_file with absolute paths).
+
+        Returns None if the tracker file exists but can't be parsed.
+        """
+        try:
+            if orjson:
+                threads = orjson.loads(self.tracker_file.read_bytes())
+            else:
+                threads = json.loads(self.tracker_file.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # JSONDecodeError (stdlib and orjson) and UnicodeDecodeError
+            threads = None
+
+        if not isinstance(threads, dict):
+            logger.warning("Could not parse thread tracker file, keeping previous threads")
+            return None
+        return threads
+
+    def _resolve_plan_path(self, plan_file: str) -> str:
+        """Resolve a tracked plan_file key to an absolute path.
+
+        Relative keys are resolved against the project root (the parent of
+        the .ralph directory).
+        """
+        if os.path.isabs(plan_file):
+            return plan_file
+        return os.path.realpath(self.ralph_dir.parent / plan_file)
 
     def _build_reverse_lookup(self) -> dict:
-        """Build reverse lookup: channel:thread_ts -> plan_file."""
+        """Build reverse lookup: channel:thread_ts -> absolute plan_file."""
         reverse = {}
         for plan_file, info in self.threads.items():
             if isinstance(info, dict) and "thread_ts" in info and "channel" in info:
                 key = f"{info['channel']}:{info['thread_ts']}"
-                reverse[key] = plan_file
+                reverse[key] = self._resolve_plan_path(plan_file)
         return reverse
 
+    def _build_derived_caches(self):
+        """Rebuild the reverse lookup and feedback paths from self.threads."""
+        thread_to_plan = self._build_reverse_lookup()
+        plan_to_feedback = {plan_file: self._get_feedback_file(plan_file) for plan_file in thread_to_plan.values()}
+        self._thread_to_plan, self._plan_to_feedback = thread_to_plan, plan_to_feedback
+
     def _save_threads(self):
         """Save thread tracking data."""
         self.tracker_file.parent.mkdir(parents=True, exist_ok=True)
-        self.tracker_file.write_text(json.dumps(self.threads, indent=2))
-        self._thread_to_plan = self._build_reverse_lookup()
+        if orjson:
+            data = orjson.dumps(self.threads, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(self.threads, indent=2).encode()
+
+        # Write to a uniquely named temp file and rename it into place so
+        # readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.tracker_file.parent, prefix=f".{self.tracker_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # mkstemp creates the file 0600; keep the tracker's existing mode,
+                # or use the default a plain write would get under the umask
+                try:
+                    mode = os.stat(self.tracker_file).st_mode & 0o7777
+                except FileNotFoundError:
+                    mode = 0o666 & ~UMASK
+                os.fchmod(f.fileno(), mode)
+                f.write(data)
+            os.replace(tmp, self.tracker_file)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+        self._build_derived_caches()
 
     def reload_threads(self):
-        """Reload threads from disk (in case they changed externally)."""
-        self.threads = self._load_threads()
-        self._thread_to_plan = self._build_reverse_lookup()
+        """Reload threads from disk (in case they changed externally).
+
+        Skips the parse when the tracker file's inode, size and mtime are
+        unchanged since the last load. Writers replace the file by rename, so
+        the inode changes even when two rewrites share an mtime tick.
+        """
+        try:
+            st = os.stat(self.tracker_file)
+            tracker_stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            tracker_stat = ()
+
+        if tracker_stat == self._tracker_stat:
+            return
+
+        threads = self._load_threads() if tracker_stat else {}
+        if threads is None:
+            # Likely caught a shell writer mid-rewrite; retry on the next message
+            self._tracker_stat = None
+            self._threads_dirty = True
+            return
+
+        self.threads = threads
+        self._build_derived_caches()
+        self._tracker_stat = tracker_stat
 
     def _get_feedback_file(self, plan_file: str) -> Path:
         """Get the feedback file path for a plan."""
         plan_path = Path(plan_file)
         return plan_path.parent / f"{plan_path.stem}.feedback.md"
 
+    def _get_pending_log(self, feedback_file: Path) -> Path:
+        """Get the append-only log that buffers replies for a feedback file."""
+        return feedback_file.with_suffix(".pending.log")
+
     def _write_feedback(self, plan_file: str, user: str, message: str):
-        """Write feedback to the plan's feedback file."""
-        feedback_file = self._get_feedback_file(plan_file)
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        """Record feedback for a plan.
+
+        Replies are appended to a sidecar log and merged into the feedback
+        file's Pending section shortly afterwards by _compact_feedback.
+        """
+        # Handlers run on a thread pool and may see the lookups mid-rebuild
+        feedback_file = self._plan_to_feedback.get(plan_file) or self._get_feedback_file(plan_file)
+        timestamp = time.strftime("%Y-%m-%d %H:%M")
+
+        with self._feedback_lock:
+            feedback_file.parent.mkdir(parents=True, exist_ok=True)
+            if not feedback_file.exists():
+                plan_name = feedback_file.name[:-len(".feedback.md")]
+                feedback_file.write_text(f"# Feedback: {plan_name}\n\n## Pending\n\n## Processed\n")
+
+            with open(self._get_pending_log(feedback_file), "a") as f:
+                f.write(f"- [{timestamp}] @{user}: {message}\n")
+
+            self._pending_feedback.add(plan_file)
+            if self._compact_timer is None:
+                self._compact_timer = threading.Timer(FEEDBACK_COMPACT_DELAY, self._compact_pending_feedback)
+                self._compact_timer.daemon = True
+                self._compact_timer.start()
 
-        # Create or update feedback file
-        if feedback_file.exists():
-            content = feedback_file.read_text()
-        else:
-            plan_name = Path(plan_file).stem
-            content = f"# Feedback: {plan_name}\n\n## Pending\n\n## Processed\n"
+        logger.info(f"Wrote feedback to {feedback_file}")
+        return feedback_file
 
-        # Find the Pending section and add the feedback
-        if "## Pending" in content:
-            parts = content.split("## Pending", 1)
-            before = parts[0]
-            after = parts[1] if len(parts) > 1 else ""
+    def _compact_feedback(self, plan_file: str):
+        """Merge a plan's pending feedback log into its feedback file.
 
-            # Insert after ## Pending line
-            new_content = f"{before}## Pending\n- [{timestamp}] @{user}: {message}\n{after.lstrip()}"
-        else:
-            # No Pending section, add at end
-            new_content = content + f"\n## Pending\n- [{timestamp}] @{user}: {message}\n"
+        Entries are added to the end of the Pending section, so it stays in
+        arrival order. The log is dropped if the plan is no longer tracked or
+        its feedback file was moved away (the plan was completed).
+        """
+        feedback_file = self._plan_to_feedback.get(plan_file)
+        tracked = feedback_file is not None
+        if not tracked:
+            feedback_file = self._get_feedback_file(plan_file)
+        pending_log = self._get_pending_log(feedback_file)
 
-        feedback_file.parent.mkdir(parents=True, exist_ok=True)
-        feedback_file.write_text(new_content)
-        logger.info(f"Wrote feedback to {feedback_file}")
-        return feedback_file
+        with self._feedback_lock:
+            try:
+                entries = pending_log.read_text()
+            except FileNotFoundError:
+                return
+
+            if not tracked or not feedback_file.exists():
+                pending_log.unlink()
+                if entries:
+                    logger.warning(f"Dropping feedback for completed plan {plan_file}:\n{entries}")
+                return
+            if not entries:
+                pending_log.unlink()
+                return
+
+            lines = feedback_file.read_text().splitlines(keepends=True)
+            # Match headers the way Ralph reads them: ignoring surrounding whitespace and case
+            header = next((i for i, line in enumerate(lines) if line.strip().lower() == "## pending"), None)
+            if header is None:
+                # No Pending section, add at end
+                if lines and not lines[-1].endswith("\n"):
+                    lines[-1] += "\n"
+                lines += ["\n", "## Pending\n", entries]
+            else:
+                # Insert after the last entry, before the next section header
+                end = next((i for i in range(header + 1, len(lines)) if lines[i].lstrip().startswith("## ")), len(lines))
+                while end - 1 > header and not lines[end - 1].strip():
+                    end -= 1
+                if not lines[end - 1].endswith("\n"):
+                    lines[end - 1] += "\n"
+                lines.insert(end, entries)
+
+            feedback_file.write_text("".join(lines))
+            pending_log.unlink()
+
+        logger.info(f"Compacted pending feedback into {feedback_file}")
+
+    def _compact_pending_feedback(self):
+        """Compact the feedback logs of every plan that received replies."""
+        # Reset the timer first so later replies still schedule compaction if this fails
+        with self._feedback_lock:
+            plan_files = self._pending_feedback
+            self._pending_feedback = set()
+            self._compact_timer = None
+
+        try:
+            # Pick up plans that were completed since the replies were logged
+            self.reload_threads()
+        except Exception as e:
+            logger.error(f"Failed to reload thread tracker before compacting feedback: {e}")
+
+        for plan_file in plan_files:
+            try:
+                self._compact_feedback(plan_file)
+            except Exception as e:
+                logger.error(f"Failed to compact feedback for {plan_file}: {e}")
+
+    def _get_display_name(self, client, user_id: str) -> str:
+        """Get a user's display name, cached to avoid a users_info call per reply."""
+        now = time.monotonic()
+        with self._user_cache_lock:
+            cached = self._user_cache.get(user_id)
+            if cached and cached[0] > now:
+                self._user_cache.move_to_end(user_id)
+                return cached[1]
+
+        try:
+            user_info = client.users_info(user=user_id)
+            display_name = user_info["user"]["profile"].get("display_name") or user_info["user"]["name"]
+        except Exception:
+            # Don't cache failures so the next reply retries the lookup
+            return user_id
+
+        with self._user_cache_lock:
+            self._user_cache[user_id] = (now + USER_CACHE_TTL, display_name)
+            self._user_cache.move_to_end(user_id)
+            while len(self._user_cache) > USER_CACHE_SIZE:
+                self._user_cache.popitem(last=False)
+        return display_name
 
     def _setup_handlers(self):
         """Set up Slack event handlers."""
@@ -184,33 +424,30 @@ class RalphSlackBot:
             if not thread_ts:
                 return
 
+            # Ignore bot messages (including our own acknowledgments)
+            if event.get("bot_id") or event.get("subtype") == "bot_message":
+                return
+
             channel = event.get("channel")
             thread_key = f"{channel}:{thread_ts}"
 
-            # Reload threads in case they changed (new plans started)
-            self.reload_threads()
+            # Reload threads if they changed (new plans started)
+            if self._observer is None or self._threads_dirty:
+                self._threads_dirty = False
+                self.reload_threads()
 
             # Check if this is a reply to a tracked plan thread
-            if thread_key not in self._thread_to_plan:
-                return
-
-            # Ignore bot messages (including our own)
-            if event.get("bot_id") or event.get("subtype") == "bot_message":
+            plan_file = self._thread_to_plan.get(thread_key)
+            if plan_file is None:
                 return
 
-            plan_file = self._thread_to_plan[thread_key]
             user = event.get("user", "unknown")
             text = event.get("text", "")
 
             if not text.strip():
                 return
 
-            # Get user info for display name
-            try:
-                user_info = client.users_info(user=user)
-                display_name = user_info["user"]["profile"].get("display_name") or user_info["user"]["name"]
-            except Exception:
-                display_name = user
+            display_name = self._get_display_name(client, user)
 
             logger.info(f"Received reply from {display_name} for plan {plan_file}: {text[:50]}...")
 
@@ -229,16 +466,38 @@ class RalphSlackBot:
     def _acquire_pid_lock(self) -> bool:
         """Acquire PID file lock. Returns True if successful."""
         try:
-            self._pid_file_handle = open(self.pid_file, 'w')
-            fcntl.flock(self._pid_file_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Open without truncating so a running bot's PID stays readable
+            # until we actually hold the lock
+            self._pid_file_handle = open(self.pid_file, 'a+')
+            fd = self._pid_file_handle.fileno()
+            # Don't let child processes inherit the locked fd
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._pid_file_handle.seek(0)
+            self._pid_file_handle.truncate()
             self._pid_file_handle.write(str(os.getpid()))
             self._pid_file_handle.flush()
+            os.fsync(fd)
             return True
         except (IOError, OSError):
+            if self._pid_file_handle:
+                self._pid_file_handle.close()
+                self._pid_file_handle = None
             return False
 
     def _release_pid_lock(self):
         """Release PID file lock."""
+        if self._observer and self._observer.is_alive():
+            self._observer.stop()
+            self._observer.join(timeout=1)
+
+        try:
+            if self._compact_timer:
+                self._compact_timer.cancel()
+            self._compact_pending_feedback()
+        except Exception as e:
+            logger.error(f"Failed to compact pending feedback on exit: {e}")
+
         if self._pid_file_handle:
             try:
                 fcntl.flock(self._pid_file_handle.fileno(), fcntl.LOCK_UN)
@@ -263,8 +522,21 @@ class RalphSlackBot:
             logger.error(f"Another bot instance is already running (pid file: {self.pid_file})")
             sys.exit(1)
 
-        # Clean up on exit
+        # Clean up on exit; turn SIGTERM into a normal exit so atexit handlers run
         atexit.register(self._release_pid_lock)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        if self._observer:
+            try:
+                self._observer.start()
+            except OSError as e:
+                # e.g. inotify watch limit reached; check the tracker on every message instead
+                logger.warning(f"Could not watch thread tracker file, polling instead: {e}")
+                self._observer = None
+
+        # Merge feedback left in pending logs by a previous run
+        self._pending_feedback.update(self._plan_to_feedback)
+        self._compact_pending_feedback()
 
         mode = "global" if self.global_mode else "local"
         logger.info(f"Starting Ralph Slack Bot ({mode} mode)")
@@ -282,37 +554,40 @@ class RalphSlackBot:
         handler.start()
 
 
-def is_bot_running(global_mode: bool = False) -> bool:
-    """Check if bot is already running."""
-    pid_file = GLOBAL_PID_FILE if global_mode else (Path.cwd() / ".ralph" / "slack_bot.pid")
+def _get_pid_file(global_mode: bool = False) -> Path:
+    """Get the bot PID file path for the given mode."""
+    return GLOBAL_PID_FILE if global_mode else (Path.cwd() / ".ralph" / "slack_bot.pid")
 
-    if not pid_file.exists():
-        return False
 
+def _probe_bot_pid(pid_file: Path) -> Optional[int]:
+    """Get PID of running bot from pid_file, or None. Cleans up stale PID files."""
     try:
         pid = int(pid_file.read_text().strip())
+    except (FileNotFoundError, ValueError):
+        # Missing, or empty while a starting bot takes the lock - leave it alone
+        return None
+
+    try:
         # Check if process is running
         os.kill(pid, 0)
-        return True
-    except (ValueError, ProcessLookupError, PermissionError):
+    except ProcessLookupError:
         # PID file exists but process is dead - clean up
         pid_file.unlink(missing_ok=True)
-        return False
+        return None
+    except PermissionError:
+        # Process exists but belongs to another user
+        pass
+    return pid
 
 
-def get_bot_pid(global_mode: bool = False) -> int:
-    """Get PID of running bot, or None."""
-    pid_file = GLOBAL_PID_FILE if global_mode else (Path.cwd() / ".ralph" / "slack_bot.pid")
+def is_bot_running(global_mode: bool = False) -> bool:
+    """Check if bot is already running."""
+    return _probe_bot_pid(_get_pid_file(global_mode)) is not None
 
-    if not pid_file.exists():
-        return None
 
-    try:
-        pid = int(pid_file.read_text().strip())
-        os.kill(pid, 0)  # Check if running
-        return pid
-    except (ValueError, ProcessLookupError, PermissionError):
-        return None
+def get_bot_pid(global_mode: bool = False) -> Optional[int]:
+    """Get PID of running bot, or None."""
+    return _probe_bot_pid(_get_pid_file(global_mode))
 
 
 def main():
@@ -325,8 +600,8 @@ def main():
     args = parser.parse_args()
 
     if args.status:
-        if is_bot_running(args.global_mode):
-            pid = get_bot_pid(args.global_mode)
+        pid = _probe_bot_pid(_get_pid_file(args.global_mode))
+        if pid is not None:
             print(f"Bot is running (PID: {pid})")
             sys.exit(0)
         else: